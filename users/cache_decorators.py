@@ -3,17 +3,109 @@ Cache performance monitoring decorators and utilities.
 
 This module provides decorators and utility functions for monitoring cache performance,
 logging execution times, and implementing advanced caching patterns.
+
+The default cache serializes values with msgpack (see CACHES in settings), so
+anything cached through these helpers must be None, bool, int, float, str,
+bytes, or lists/dicts of those. Tuples come back as lists, and datetimes,
+Decimals, sets and model instances raise TypeError; serialize them first.
 """
 
 import functools
+import hashlib
+import pickle
+import threading
 import time
 import logging
+from cachetools import TTLCache
 from django.core.cache import cache
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import QuerySet
+from django.dispatch import receiver
 from typing import Callable, Any, Optional
 
+__all__ = [
+    'cache_performance',
+    'get_or_compute',
+    'cache_with_timeout',
+    'cache_key_builder',
+    'get_cache_version',
+    'bump_cache_version',
+    'list_cache_key',
+    'json_body_key',
+    'local_cache_get',
+    'local_cache_delete',
+    'invalidate_on_commit',
+    'get_redis',
+    'clear_cache_pattern',
+    'get_cache_stats',
+    'warm_cache',
+    'CacheContext',
+    'cached_result',
+]
+
 logger = logging.getLogger(__name__)
 
+# Raw Redis client, resolved on first use by get_redis()
+_redis = None
+
+# In-process L1 in front of Redis for pre-rendered bodies, bounded by total
+# size in bytes. Entries live at most LOCAL_CACHE_TTL seconds, which bounds
+# staleness for writes made by other processes.
+# Values over LOCAL_CACHE_MAX_ENTRY_SIZE are only served from Redis (TTLCache
+# rejects values bigger than its maxsize, and one body should not evict
+# everything else).
+LOCAL_CACHE_TTL = 30
+LOCAL_CACHE_MAX_ENTRY_SIZE = 8 * 1024 * 1024
+_local_cache = TTLCache(maxsize=64 * 1024 * 1024, ttl=LOCAL_CACHE_TTL, getsizeof=len)
+_local_cache_lock = threading.Lock()
+
+# Distinguishes a cache miss from a cached None
+_MISSING = object()
+
+# How long a caller may hold the recompute lock, and how often others poll.
+# Waiters block a request thread, so the lock is kept short: a crashed or
+# slow holder delays other requests for that key by at most this long.
+RECOMPUTE_LOCK_TIMEOUT = 5
+RECOMPUTE_WAIT = 0.05
+
+
+@functools.lru_cache(maxsize=1)
+def _default_ttl() -> int:
+    """Return settings.CACHE_TTL, looked up once until the cache is cleared."""
+    return settings.CACHE_TTL
+
+
+@receiver(setting_changed)
+def _reset_default_ttl(sender, setting, **kwargs):
+    """Pick up CACHE_TTL overrides (e.g. override_settings in tests)."""
+    if setting == 'CACHE_TTL':
+        _default_ttl.cache_clear()
+
+
+def _args_digest(args: tuple, kwargs: dict) -> str:
+    """
+    Build a short, order-independent digest of call arguments.
+    
+    Arguments are pickled rather than repr()'d, so keys stay ~32 characters
+    regardless of argument size and model reprs never run queries.
+    
+    Raises:
+        TypeError: If an argument is a QuerySet (pickling would evaluate it)
+            or is otherwise unpicklable
+    """
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, QuerySet):
+            raise TypeError("QuerySets cannot be used in cache keys; pass primary keys instead")
+    
+    try:
+        payload = pickle.dumps((args, tuple(sorted(kwargs.items()))), protocol=5)
+    except (pickle.PicklingError, AttributeError) as e:
+        # Lambdas and local classes fail with these rather than TypeError
+        raise TypeError(f"Cache key arguments must be picklable: {e}") from e
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
 
 def cache_performance(cache_name: str) -> Callable:
     """
@@ -31,23 +123,94 @@ def cache_performance(cache_name: str) -> Callable:
             return Response(data)
     """
     def decorator(func: Callable) -> Callable:
+        # Metrics are off in production unless explicitly enabled
+        if not settings.DEBUG and not getattr(settings, 'CACHE_METRICS_ENABLED', False):
+            return func
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
             result = func(*args, **kwargs)
-            end_time = time.time()
-            
-            execution_time = end_time - start_time
-            logger.info(f"{cache_name}: {execution_time:.4f}s")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("%s: %.4fs", cache_name, (time.perf_counter_ns() - start_ns) / 1e9)
             return result
         return wrapper
     return decorator
 
 
+def get_or_compute(cache_key: str, compute: Callable[[], Any], timeout: Optional[int] = None,
+                   name: Optional[str] = None, version: Optional[int] = None) -> Any:
+    """
+    Get a cached value, computing and caching it on a miss.
+    
+    Unlike cache.get_or_set(), a cached None counts as a hit, and only the
+    caller that wins a short-lived lock recomputes; concurrent callers poll
+    until it has populated the cache (avoids a stampede). The value must be
+    msgpack-serializable (see the module docstring).
+    
+    With name and version, the computed value is not cached (or is deleted
+    again) once the model's cache version differs from version, so a value
+    computed from rows that were updated meanwhile cannot outlive the
+    update's invalidation.
+    
+    Args:
+        cache_key (str): Key to read and populate
+        compute (callable): Zero-argument callable producing the value
+        timeout (int, optional): Cache timeout in seconds. Uses CACHE_TTL if None.
+        name (str, optional): Lower-case model name the value is read from
+        version (int, optional): get_cache_version(name), read before compute
+        
+    Returns:
+        The cached or freshly computed value
+        
+    Example:
+        data = get_or_compute('report', build_report, timeout=600)
+    """
+    cached_value = cache.get(cache_key, _MISSING)
+    if cached_value is not _MISSING:
+        logger.info("Cache HIT: %s", cache_key)
+        return cached_value
+    
+    logger.info("Cache MISS: %s", cache_key)
+    
+    lock_key = f"{cache_key}:lock"
+    if cache.add(lock_key, 1, timeout=RECOMPUTE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if name is None or get_cache_version(name) == version:
+                effective_ttl = timeout if timeout is not None else _default_ttl()
+                cache.set(cache_key, value, timeout=effective_ttl)
+                # An invalidation that started before the set landed may
+                # already have deleted the key; undo the set in that case
+                if name is not None and get_cache_version(name) != version:
+                    cache.delete(cache_key)
+        finally:
+            cache.delete(lock_key)
+        return value
+    
+    # Another caller is computing: poll until it populates the key, and only
+    # compute here if it gives up (lock released without a value) or the
+    # lock outlives RECOMPUTE_LOCK_TIMEOUT
+    deadline = time.monotonic() + RECOMPUTE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_WAIT)
+        lock_held = cache.get(lock_key) is not None
+        value = cache.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not lock_held:
+            break
+    
+    return compute()
+
+
 def cache_with_timeout(timeout: Optional[int] = None, key_prefix: str = "") -> Callable:
     """
     Decorator to automatically cache function results.
     
+    Arguments of the decorated function must be picklable and must not be
+    QuerySets, since they are hashed into the cache key.
+    
     Args:
         timeout (int, optional): Cache timeout in seconds. Uses CACHE_TTL if None.
         key_prefix (str, optional): Prefix for the cache key
@@ -60,29 +223,13 @@ def cache_with_timeout(timeout: Optional[int] = None, key_prefix: str = "") -> C
         def expensive_operation(user_id):
             return expensive_calculation(user_id)
     """
-    if timeout is None:
-        timeout = settings.CACHE_TTL
-    
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             # Generate cache key
-            cache_key = f"{key_prefix}{func.__name__}_{args}_{kwargs}"
-            
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.info(f"Cache HIT: {cache_key}")
-                return cached_result
-            
-            # Execute function
-            logger.info(f"Cache MISS: {cache_key}")
-            result = func(*args, **kwargs)
+            cache_key = f"{key_prefix}{func.__module__}.{func.__qualname__}:{_args_digest(args, kwargs)}"
             
-            # Store in cache
-            cache.set(cache_key, result, timeout=timeout)
-            
-            return result
+            return get_or_compute(cache_key, lambda: func(*args, **kwargs), timeout)
         return wrapper
     return decorator
 
@@ -91,6 +238,8 @@ def cache_key_builder(prefix: str, *args, **kwargs) -> str:
     """
     Build a consistent cache key from prefix and arguments.
     
+    Arguments must be picklable and must not be QuerySets.
+    
     Args:
         prefix (str): The prefix for the cache key
         *args: Variable positional arguments to include in key
@@ -101,19 +250,156 @@ def cache_key_builder(prefix: str, *args, **kwargs) -> str:
         
     Example:
         key = cache_key_builder('user', user_id=123, type='profile')
-        # Returns: 'user_123_profile'
+        # Returns: 'user:<32-character hex digest>'
+    """
+    return f"{prefix}:{_args_digest(args, kwargs)}"
+
+
+def get_cache_version(name: str) -> int:
+    """
+    Get the current cache version for a model.
+    
+    A missing version (never set, or evicted) is seeded from the clock
+    rather than restarting at a fixed value, so it can never collide with
+    a version whose stale entries are still cached.
+    
+    Args:
+        name (str): Lower-case model name (e.g., 'user')
+        
+    Returns:
+        int: Current version
+    """
+    return cache.get_or_set(f"v:{name}", time.time_ns, timeout=None)
+
+
+def bump_cache_version(name: str) -> int:
+    """
+    Invalidate every versioned cache entry for a model in O(1).
+    
+    Entries built with list_cache_key() embed the version, so incrementing
+    it makes all of them unreachable; they then expire through their TTL.
+    
+    Args:
+        name (str): Lower-case model name (e.g., 'user')
+        
+    Returns:
+        int: The new version
+    """
+    version_key = f"v:{name}"
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        # The version key does not exist yet: seed it, then move past it
+        get_cache_version(name)
+        return cache.incr(version_key)
+
+
+def list_cache_key(name: str) -> str:
     """
-    parts = [prefix]
+    Build the versioned cache key for a model's list.
     
-    # Add positional arguments
-    for arg in args:
-        parts.append(str(arg))
+    Args:
+        name (str): Lower-case model name (e.g., 'user')
+        
+    Returns:
+        str: Cache key such as 'user_list:v1760000000000000003'
+    """
+    return f"{name}_list:v{get_cache_version(name)}"
+
+
+def json_body_key(cache_key: str) -> str:
+    """
+    Build the key holding the pre-rendered JSON body for a cache entry.
     
-    # Add keyword arguments (sorted for consistency)
-    for key in sorted(kwargs.keys()):
-        parts.append(f"{key}_{kwargs[key]}")
+    Args:
+        cache_key (str): Key of the cached data (e.g., 'user_5')
+        
+    Returns:
+        str: Cache key such as 'user_5:bytes'
+    """
+    return f"{cache_key}:bytes"
+
+
+def local_cache_get(cache_key: str) -> Optional[bytes]:
+    """
+    Get a bytes value from the in-process L1 cache, falling back to Redis.
+    
+    A Redis hit of up to LOCAL_CACHE_MAX_ENTRY_SIZE bytes is copied into
+    L1, so repeat hits in this process skip the network round trip and
+    decoding.
     
-    return "_".join(parts)
+    Args:
+        cache_key (str): Key of a cached bytes value
+        
+    Returns:
+        bytes: The cached value, or None on a miss
+    """
+    with _local_cache_lock:
+        value = _local_cache.get(cache_key)
+    if value is not None:
+        return value
+    
+    value = cache.get(cache_key)
+    if value is not None and len(value) <= LOCAL_CACHE_MAX_ENTRY_SIZE:
+        with _local_cache_lock:
+            _local_cache[cache_key] = value
+    return value
+
+
+def local_cache_delete(keys) -> None:
+    """
+    Drop keys from this process's L1 cache.
+    
+    Args:
+        keys (iterable): Cache keys to drop
+    """
+    with _local_cache_lock:
+        for key in keys:
+            _local_cache.pop(key, None)
+
+
+def invalidate_on_commit(name: str, ids=()) -> None:
+    """
+    Invalidate a model's caches once the current transaction commits.
+    
+    Bumps the model's list cache version and deletes the individual entries
+    (and their pre-rendered JSON bodies) for the given primary keys. Outside
+    a transaction this runs immediately.
+    
+    Args:
+        name (str): Lower-case model name (e.g., 'user')
+        ids (iterable, optional): Primary keys whose individual caches to clear
+    """
+    # Copy now: deleted instances lose their pk before the commit runs
+    keys = []
+    for pk in ids:
+        key = f"{name}_{pk}"
+        keys += [key, json_body_key(key)]
+    
+    def invalidate():
+        bump_cache_version(name)
+        if keys:
+            cache.delete_many(keys)
+            local_cache_delete(keys)
+    
+    transaction.on_commit(invalidate)
+
+
+def get_redis():
+    """
+    Get the raw Redis client behind the default cache.
+    
+    The client is looked up once and reused for the life of the process;
+    django-redis keeps its connection pool on it.
+    
+    Returns:
+        redis.Redis: Redis client for the 'default' cache
+    """
+    global _redis
+    if _redis is None:
+        from django_redis import get_redis_connection
+        _redis = get_redis_connection('default')
+    return _redis
 
 
 def clear_cache_pattern(pattern: str) -> int:
@@ -131,28 +417,38 @@ def clear_cache_pattern(pattern: str) -> int:
         print(f"Cleared {deleted} cache entries")
     """
     try:
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection('default')
+        redis_conn = get_redis()
         
-        # Find all keys matching the pattern
-        keys = redis_conn.keys(pattern)
+        # Walk matching keys incrementally with SCAN rather than KEYS, which
+        # blocks Redis for the whole keyspace, and UNLINK them in batches so
+        # memory is reclaimed in the background
+        deleted_count = 0
+        batch = []
+        for key in redis_conn.scan_iter(match=pattern, count=1000):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted_count += redis_conn.unlink(*batch)
+                batch = []
         
-        # Delete the keys
-        if keys:
-            deleted_count = redis_conn.delete(*keys)
+        if batch:
+            deleted_count += redis_conn.unlink(*batch)
+        
+        if deleted_count:
             logger.info(f"Cleared {deleted_count} cache entries matching '{pattern}'")
-            return deleted_count
         
-        return 0
+        return deleted_count
     except Exception as e:
         logger.error(f"Error clearing cache pattern '{pattern}': {str(e)}")
         return 0
 
 
-def get_cache_stats() -> dict:
+def get_cache_stats(sample_size: int = 10) -> dict:
     """
     Get detailed cache statistics from Redis.
     
+    Args:
+        sample_size (int, optional): Number of keys to include in keys_sample
+        
     Returns:
         dict: Dictionary containing cache statistics
         
@@ -161,30 +457,31 @@ def get_cache_stats() -> dict:
         print(f"Cache memory used: {stats['used_memory_human']}")
     """
     try:
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection('default')
+        redis_conn = get_redis()
         
-        # Get all keys
-        keys = redis_conn.keys('*')
+        # DBSIZE is O(1); only scan as far as needed for the sample
+        total_keys = redis_conn.dbsize()
+        keys_sample = []
+        for key in redis_conn.scan_iter(count=sample_size):
+            keys_sample.append(key.decode('utf-8') if isinstance(key, (bytes, bytearray)) else key)
+            if len(keys_sample) >= sample_size:
+                break
         
-        # Get Redis info
+        # Get Redis info; the default sections already include 'stats'
         info = redis_conn.info()
         
-        # Get database stats
-        db_stats = redis_conn.info('stats')
-        
         return {
             'status': 'success',
-            'total_keys': len(keys),
+            'total_keys': total_keys,
             'used_memory': info.get('used_memory', 0),
             'used_memory_human': info.get('used_memory_human', 'N/A'),
             'used_memory_peak': info.get('used_memory_peak', 0),
             'used_memory_peak_human': info.get('used_memory_peak_human', 'N/A'),
             'connected_clients': info.get('connected_clients', 0),
-            'total_connections_received': db_stats.get('total_connections_received', 0),
-            'total_commands_processed': db_stats.get('total_commands_processed', 0),
+            'total_connections_received': info.get('total_connections_received', 0),
+            'total_commands_processed': info.get('total_commands_processed', 0),
             'instantaneous_ops_per_sec': info.get('instantaneous_ops_per_sec', 0),
-            'keys_sample': [k.decode('utf-8') if isinstance(k, bytes) else k for k in keys[:10]],
+            'keys_sample': keys_sample,
         }
     except Exception as e:
         logger.error(f"Error getting cache stats: {str(e)}")
@@ -206,17 +503,17 @@ def warm_cache(data_dict: dict, timeout: Optional[int] = None) -> int:
         int: Number of items cached
         
     Example:
-        data = {'user_1': user_obj, 'user_2': user_obj2}
+        data = {'user_1': UserSerializer(user).data, 'user_2': UserSerializer(user2).data}
         count = warm_cache(data, timeout=3600)
     """
     if timeout is None:
-        timeout = settings.CACHE_TTL
+        timeout = _default_ttl()
     
     count = 0
     try:
-        for key, value in data_dict.items():
-            cache.set(key, value, timeout=timeout)
-            count += 1
+        # Pipelined by django-redis into a single batch
+        cache.set_many(data_dict, timeout=timeout)
+        count = len(data_dict)
         
         logger.info(f"Warmed cache with {count} items")
         return count
@@ -246,7 +543,7 @@ class CacheContext:
         for key in self.keys_to_clear:
             try:
                 cache.delete(key)
-                logger.info(f"Cleared cache key: {key}")
+                logger.info("Cleared cache key: %s", key)
             except Exception as e:
                 logger.error(f"Error clearing cache key {key}: {str(e)}")
         
@@ -268,9 +565,6 @@ def cached_result(timeout: Optional[int] = None) -> Callable:
         def expensive_query():
             return heavy_computation()
     """
-    if timeout is None:
-        timeout = settings.CACHE_TTL
-    
     def decorator(func: Callable) -> Callable:
         cache_key = f"cached_{func.__name__}"
         
@@ -279,13 +573,14 @@ def cached_result(timeout: Optional[int] = None) -> Callable:
             # Try cache first
             result = cache.get(cache_key)
             if result is not None:
-                logger.info(f"Cache HIT for {cache_key}")
+                logger.info("Cache HIT for %s", cache_key)
                 return result
             
             # Execute and cache
-            logger.info(f"Cache MISS for {cache_key}")
+            logger.info("Cache MISS for %s", cache_key)
             result = func(*args, **kwargs)
-            cache.set(cache_key, result, timeout=timeout)
+            effective_ttl = timeout if timeout is not None else _default_ttl()
+            cache.set(cache_key, result, timeout=effective_ttl)
             
             return result
         
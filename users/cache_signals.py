@@ -3,11 +3,14 @@ Signal handlers for cache invalidation.
 
 This module implements Django signals to automatically invalidate caches
 when User, Passenger, or Rider objects are created, updated, or deleted.
+List caches are versioned per model, so bumping the version invalidates
+every list variant at once; individual entries are deleted by key. All
+invalidation is deferred until the surrounding transaction commits.
 """
 
-from django.core.cache import cache
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cache_decorators import invalidate_on_commit
 from .models import User, Passenger, Rider
 import logging
 
@@ -22,12 +25,9 @@ def invalidate_user_cache(sender, instance, created, **kwargs):
     This handles both creation and updates of User objects,
     ensuring that cached user list and individual user data are cleared.
     """
-    # Always clear the user list cache
-    cache.delete('user_list')
-    
-    # Clear individual user cache if updating existing user
-    if not created:
-        cache.delete(f'user_{instance.id}')
+    # Always invalidate the user list caches, and the individual user
+    # cache if updating existing user
+    invalidate_on_commit('user', () if created else (instance.id,))
     
     action = "created" if created else "updated"
     logger.info(f"Cache invalidated for user {instance.id} ({action})")
@@ -40,11 +40,8 @@ def invalidate_user_cache_on_delete(sender, instance, **kwargs):
     
     Clears the user list cache and the individual user cache.
     """
-    # Clear the user list cache
-    cache.delete('user_list')
-    
-    # Clear individual user cache
-    cache.delete(f'user_{instance.id}')
+    # Invalidate the user list caches and the individual user cache
+    invalidate_on_commit('user', (instance.id,))
     
     logger.info(f"Cache invalidated for deleted user {instance.id}")
 
@@ -57,12 +54,9 @@ def invalidate_passenger_cache(sender, instance, created, **kwargs):
     This handles both creation and updates of Passenger objects,
     ensuring that cached passenger list and individual passenger data are cleared.
     """
-    # Always clear the passenger list cache
-    cache.delete('passenger_list')
-    
-    # Clear individual passenger cache if updating existing passenger
-    if not created:
-        cache.delete(f'passenger_{instance.id}')
+    # Always invalidate the passenger list caches, and the individual passenger
+    # cache if updating existing passenger
+    invalidate_on_commit('passenger', () if created else (instance.id,))
     
     action = "created" if created else "updated"
     logger.info(f"Cache invalidated for passenger {instance.id} ({action})")
@@ -75,11 +69,8 @@ def invalidate_passenger_cache_on_delete(sender, instance, **kwargs):
     
     Clears the passenger list cache and the individual passenger cache.
     """
-    # Clear the passenger list cache
-    cache.delete('passenger_list')
-    
-    # Clear individual passenger cache
-    cache.delete(f'passenger_{instance.id}')
+    # Invalidate the passenger list caches and the individual passenger cache
+    invalidate_on_commit('passenger', (instance.id,))
     
     logger.info(f"Cache invalidated for deleted passenger {instance.id}")
 
@@ -92,12 +83,9 @@ def invalidate_rider_cache(sender, instance, created, **kwargs):
     This handles both creation and updates of Rider objects,
     ensuring that cached rider list and individual rider data are cleared.
     """
-    # Always clear the rider list cache
-    cache.delete('rider_list')
-    
-    # Clear individual rider cache if updating existing rider
-    if not created:
-        cache.delete(f'rider_{instance.id}')
+    # Always invalidate the rider list caches, and the individual rider
+    # cache if updating existing rider
+    invalidate_on_commit('rider', () if created else (instance.id,))
     
     action = "created" if created else "updated"
     logger.info(f"Cache invalidated for rider {instance.id} ({action})")
@@ -110,10 +98,7 @@ def invalidate_rider_cache_on_delete(sender, instance, **kwargs):
     
     Clears the rider list cache and the individual rider cache.
     """
-    # Clear the rider list cache
-    cache.delete('rider_list')
-    
-    # Clear individual rider cache
-    cache.delete(f'rider_{instance.id}')
+    # Invalidate the rider list caches and the individual rider cache
+    invalidate_on_commit('rider', (instance.id,))
     
     logger.info(f"Cache invalidated for deleted rider {instance.id}")
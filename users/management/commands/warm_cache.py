@@ -9,12 +9,25 @@ and reduce database load.
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
 from django.conf import settings
+from users.cache_decorators import list_cache_key
 from users.models import User, Passenger, Rider
-from users.serializers import UserSerializer, PassengerSerializer, RiderSerializer
+from users.serializers import UserSerializer, PassengerSerializer, RiderSerializer, serialize_rows
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Number of rows fetched and cached per round trip
+WARM_BATCH_SIZE = 500
+
+
+def chunked(iterable, size):
+    """Yield successive lists of at most ``size`` items from ``iterable``"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
 
 class Command(BaseCommand):
     help = 'Warm up the cache with frequently accessed data'
@@ -26,6 +39,46 @@ class Command(BaseCommand):
             help='Clear all caches before warming',
         )
 
+    def warm_model(self, name, queryset, serializer_class):
+        """
+        Pre-cache the list and individual entries for one model.
+
+        Rows are serialized straight from ``.values()`` and written one
+        set_many batch per chunk, so entries land in the cache while the
+        rest are still being read. Each batch is written on a background
+        thread, overlapping the Redis round trip with reading the next
+        chunk from the database. The list is built from the same rows.
+
+        Returns:
+            int: Number of individual entries cached
+        """
+        list_data = []
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            rows = serialize_rows(queryset, serializer_class, chunk_size=WARM_BATCH_SIZE)
+            for chunk in chunked(rows, WARM_BATCH_SIZE):
+                batch = {f"{name}_{row['id']}": row for row in chunk}
+                # Wait for the previous write so errors surface and at most
+                # one batch is in flight
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(cache.set_many, batch, timeout=settings.CACHE_TTL)
+                list_data.extend(chunk)
+
+            if pending is not None:
+                pending.result()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully cached {len(list_data)} individual {name}s')
+        )
+
+        cache.set(list_cache_key(name), list_data, timeout=settings.CACHE_TTL)
+        self.stdout.write(
+            self.style.SUCCESS(f'Cached {name} list with {len(list_data)} {name}s')
+        )
+
+        return len(list_data)
+
     def handle(self, *args, **options):
         """Execute the cache warming process"""
         try:
@@ -36,62 +89,10 @@ class Command(BaseCommand):
                     self.style.SUCCESS('Cleared all caches')
                 )
 
-            # Pre-cache user list
-            users = User.objects.all()
-            serializer = UserSerializer(users, many=True)
-            cache.set('user_list', serializer.data, timeout=settings.CACHE_TTL)
-            self.stdout.write(
-                self.style.SUCCESS(f'Cached user list with {len(users)} users')
-            )
-
-            # Pre-cache individual users
-            user_count = 0
-            for user in users:
-                user_data = UserSerializer(user).data
-                cache.set(f'user_{user.id}', user_data, timeout=settings.CACHE_TTL)
-                user_count += 1
-
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully cached {user_count} individual users')
-            )
-
-            # Pre-cache passenger list
-            passengers = Passenger.objects.all()
-            passenger_serializer = PassengerSerializer(passengers, many=True)
-            cache.set('passenger_list', passenger_serializer.data, timeout=settings.CACHE_TTL)
-            self.stdout.write(
-                self.style.SUCCESS(f'Cached passenger list with {len(passengers)} passengers')
-            )
-
-            # Pre-cache individual passengers
-            passenger_count = 0
-            for passenger in passengers:
-                passenger_data = PassengerSerializer(passenger).data
-                cache.set(f'passenger_{passenger.id}', passenger_data, timeout=settings.CACHE_TTL)
-                passenger_count += 1
-
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully cached {passenger_count} individual passengers')
-            )
-
-            # Pre-cache rider list
-            riders = Rider.objects.all()
-            rider_serializer = RiderSerializer(riders, many=True)
-            cache.set('rider_list', rider_serializer.data, timeout=settings.CACHE_TTL)
-            self.stdout.write(
-                self.style.SUCCESS(f'Cached rider list with {len(riders)} riders')
-            )
-
-            # Pre-cache individual riders
-            rider_count = 0
-            for rider in riders:
-                rider_data = RiderSerializer(rider).data
-                cache.set(f'rider_{rider.id}', rider_data, timeout=settings.CACHE_TTL)
-                rider_count += 1
-
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully cached {rider_count} individual riders')
-            )
+            # Pre-cache lists and individual records for each model
+            user_count = self.warm_model('user', User.objects.order_by('id'), UserSerializer)
+            passenger_count = self.warm_model('passenger', Passenger.objects.order_by('id'), PassengerSerializer)
+            rider_count = self.warm_model('rider', Rider.objects.order_by('id'), RiderSerializer)
 
             # Summary
             total_items = user_count + passenger_count + rider_count + 3  # +3 for list caches
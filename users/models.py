@@ -9,9 +9,38 @@ from django.db.models.fields import EmailField, CharField, BooleanField, DateTim
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from users.cache_decorators import invalidate_on_commit
 
 
-class CustomUserManager(BaseUserManager):
+class CacheInvalidatingQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes invalidate the model's caches.
+    
+    bulk_create() and update() bypass post_save, so the cache signal
+    handlers never see them; bulk_update() is covered through update().
+    Bulk deletes still send post_delete and need no override.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        # Upserts rewrite existing rows, so their individual caches go too;
+        # the returned objects carry pks where the backend returns them
+        ids = ()
+        if kwargs.get('update_conflicts'):
+            ids = [obj.pk for obj in created if obj.pk is not None]
+        invalidate_on_commit(self.model._meta.model_name, ids)
+        return created
+
+    def update(self, **kwargs):
+        # Costs an extra SELECT of every matching pk before the UPDATE (per
+        # batch for bulk_update()); unbounded for broad filters, but needed
+        # to clear the individual caches of the rows being changed
+        ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_on_commit(self.model._meta.model_name, ids)
+        return rows
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CacheInvalidatingQuerySet)):
     """
     Custom user model manager where email is the unique identifier
     for authentication instead of usernames.
@@ -91,6 +120,7 @@ class Passenger(models.Model):
     preferred_payment_method = models.CharField(max_length=10, default='momo')
     home_address = models.TextField(max_length=100)
 
+    objects = CacheInvalidatingQuerySet.as_manager()
 
     def __str__(self):
         return f"Passenger: {self.user.email}"
@@ -110,6 +140,8 @@ class Passenger(models.Model):
 class Rider(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='rider_profile')
 
+    objects = CacheInvalidatingQuerySet.as_manager()
+
     def __str__(self):
         return f"Rider: {self.user.email}"
 
@@ -34,4 +34,28 @@ class RiderSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Rider
-        fields = ['id', 'user', 'user_id']
\ No newline at end of file
+        fields = ['id', 'user', 'user_id']
+
+
+def serialize_rows(queryset, serializer_class, chunk_size=2000):
+    """
+    Yield serialized dicts for a queryset straight from ``.values()`` rows.
+
+    Skips model instantiation and DRF field binding, producing the same
+    output as ``serializer_class(queryset, many=True).data``. Only valid for
+    serializers whose readable fields are plain model fields, plus an
+    optional read-only ``UserSerializer`` nested under ``user``. Rows are
+    streamed from the database ``chunk_size`` at a time.
+    """
+    fields = [name for name, field in serializer_class().fields.items() if not field.write_only]
+    user_fields = UserSerializer.Meta.fields
+    nests_user = 'user' in fields
+
+    columns = [name for name in fields if name != 'user']
+    if nests_user:
+        columns += [f'user__{name}' for name in user_fields]
+
+    for row in queryset.values(*columns).iterator(chunk_size=chunk_size):
+        if nests_user:
+            row['user'] = {name: row[f'user__{name}'] for name in user_fields}
+        yield {name: row[name] for name in fields}
@@ -1,3 +1,139 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users import cache_decorators
+from users.models import User, Passenger, Rider
+from users.serializers import UserSerializer, PassengerSerializer, RiderSerializer, serialize_rows
+from users.views import MAX_BULK_IDS, UserViewSet
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users-tests',
+    }
+}
+
+
+class CacheDecoratorsImportTests(SimpleTestCase):
+    """Guard against users.cache_decorators being shadowed by a stub."""
+
+    def test_cache_with_timeout_is_importable(self):
+        from users.cache_decorators import cache_with_timeout
+        self.assertTrue(callable(cache_with_timeout))
+
+    def test_all_names_exist(self):
+        for name in cache_decorators.__all__:
+            with self.subTest(name=name):
+                self.assertTrue(hasattr(cache_decorators, name))
+
+
+class SerializeRowsTests(TestCase):
+    """serialize_rows() must produce exactly what the DRF serializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        passenger_user = User.objects.create_user(
+            'passenger@example.com', 'pw', user_type='passenger',
+            first_name='Pat', phone_number='+256700000001',
+        )
+        rider_user = User.objects.create_user('rider@example.com', 'pw', user_type='rider')
+        Passenger.objects.create(user=passenger_user, passenger_id='P1', home_address='Kampala')
+        Rider.objects.create(user=rider_user)
+
+    def assertMatchesSerializer(self, queryset, serializer_class):
+        self.assertEqual(
+            list(serialize_rows(queryset, serializer_class)),
+            serializer_class(queryset, many=True).data,
+        )
+
+    def test_user_rows(self):
+        self.assertMatchesSerializer(User.objects.order_by('id'), UserSerializer)
+
+    def test_passenger_rows(self):
+        self.assertMatchesSerializer(Passenger.objects.select_related('user').order_by('id'), PassengerSerializer)
+
+    def test_rider_rows(self):
+        self.assertMatchesSerializer(Rider.objects.select_related('user').order_by('id'), RiderSerializer)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedRetrieveTests(TestCase):
+    """Cached detail responses must not outlive a concurrent update."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('old@example.com', 'pw', user_type='rider', first_name='OLD')
+        self.url = f'/api/users/{self.user.pk}/'
+
+    def test_update_during_retrieve_miss_is_not_cached(self):
+        get_object = UserViewSet.get_object
+
+        def get_object_then_update(view):
+            # The row is read, then another request's update commits
+            obj = get_object(view)
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.filter(pk=obj.pk).update(first_name='NEW')
+            return obj
+
+        with mock.patch.object(UserViewSet, 'get_object', get_object_then_update):
+            self.assertEqual(self.client.get(self.url).json()['first_name'], 'OLD')
+
+        self.assertIsNone(cache.get(f'user_{self.user.pk}'))
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url).json()['first_name'], 'NEW')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkEndpointTests(TestCase):
+    """GET <resource>/bulk/?id=... returns detail rows in request order."""
+
+    url = '/api/users/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(f'user{i}@example.com', 'pw', user_type='rider')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, *ids):
+        return self.client.get(self.url, {'id': [str(i) for i in ids]})
+
+    def test_rows_follow_request_order_without_duplicates(self):
+        first, second, third = (user.pk for user in self.users)
+        response = self.get_ids(third, first, third, second)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [third, first, second])
+
+    def test_unknown_and_out_of_range_ids_are_skipped(self):
+        pk = self.users[0].pk
+        response = self.get_ids(pk, 999999, 99999999999999999999999, -1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [pk])
+
+    def test_cached_rows_are_served_from_the_cache(self):
+        user = self.users[0]
+        cache.set(f'user_{user.pk}', {'id': user.pk, 'email': 'cached@example.com'})
+        response = self.get_ids(user.pk, self.users[1].pk)
+        self.assertEqual(
+            [row['email'] for row in response.json()],
+            ['cached@example.com', self.users[1].email],
+        )
+
+    def test_non_integer_id_is_rejected(self):
+        self.assertEqual(self.get_ids('abc').status_code, 400)
+
+    def test_too_many_ids_are_rejected(self):
+        self.assertEqual(self.get_ids(*range(1, MAX_BULK_IDS + 2)).status_code, 400)
+        self.assertEqual(self.get_ids(*range(1, MAX_BULK_IDS + 1)).status_code, 200)
+
+    def test_no_ids_returns_an_empty_list(self):
+        self.assertEqual(self.client.get(self.url).json(), [])
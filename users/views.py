@@ -1,38 +1,36 @@
+from django.http import HttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from django.core.cache import cache
 from django.conf import settings
+from django.db import connection
 
+from users.cache_decorators import (
+    cache_performance, get_cache_stats, get_cache_version, get_or_compute, json_body_key,
+    list_cache_key, local_cache_delete, local_cache_get,
+)
 from users.models import User, Passenger, Rider
-from users.serializers import UserSerializer, PassengerSerializer, RiderSerializer
-from django.core.cache import cache
-from django.conf import settings
-from rest_framework.response import Response
+from users.serializers import UserSerializer, PassengerSerializer, RiderSerializer, serialize_rows
 
-import functools
-import time
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Background writer for cache entries the current request does not need;
+# worker threads are joined at interpreter exit, so queued writes drain
+_cache_write_executor = ThreadPoolExecutor(max_workers=2)
+
+# Deferred writes beyond this many in flight are dropped instead of queued
+MAX_PENDING_CACHE_WRITES = 256
+_pending_cache_writes = threading.BoundedSemaphore(MAX_PENDING_CACHE_WRITES)
 
-# Cache performance monitoring decorator
-def cache_performance(cache_name):
-    """Decorator to monitor cache performance and log execution time"""
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            start_time = time.time()
-            result = func(*args, **kwargs)
-            end_time = time.time()
-            
-            execution_time = end_time - start_time
-            logger.info(f"{cache_name}: {execution_time:.4f}s")
-            return result
-        return wrapper
-    return decorator
+# Bounds the MGET and the id__in query behind the bulk endpoints
+MAX_BULK_IDS = 100
 
 
 def get_cache_key(prefix, identifier=None):
@@ -41,6 +39,168 @@ def get_cache_key(prefix, identifier=None):
         return f"{prefix}_{identifier}"
     return prefix
 
+
+def get_cached_json_response(request, cache_key):
+    """
+    Serve a pre-rendered JSON body straight from the cache.
+    
+    Skips building a Response and running the renderer on a hit. Returns
+    None on a miss or when the client negotiated a non-JSON format.
+    """
+    if request.accepted_renderer.format != 'json':
+        return None
+    
+    body = local_cache_get(json_body_key(cache_key))
+    if body is None:
+        return None
+    return HttpResponse(body, content_type=request.accepted_renderer.media_type)
+
+
+def _write_unless_invalidated(name, version, build):
+    entries = build()
+    if get_cache_version(name) != version:
+        return
+    
+    cache.set_many(entries, timeout=settings.CACHE_TTL)
+    # Invalidation bumps the version before deleting keys: if it started
+    # before the write landed, its deletes may already have run, so undo the
+    # write here; if it starts later, its deletes remove the write
+    if get_cache_version(name) != version:
+        keys = list(entries)
+        cache.delete_many(keys)
+        local_cache_delete(keys)
+
+
+def _cache_write_done(future):
+    _pending_cache_writes.release()
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Deferred cache write failed: %s", exc, exc_info=exc)
+
+
+def defer_cache_write(name, version, build):
+    """
+    Write cache entries in the background unless the model's caches are
+    invalidated first.
+    
+    build() runs on the writer thread and returns the {key: value} entries
+    to set. version is get_cache_version(name) read before the data in them
+    was read from the database, so a write racing an update is dropped
+    instead of restoring pre-update data. Writes are shed when
+    MAX_PENDING_CACHE_WRITES are already in flight; failures are logged.
+    """
+    if not _pending_cache_writes.acquire(blocking=False):
+        logger.warning("Cache write backlog full, dropping write for %s", name)
+        return
+    future = _cache_write_executor.submit(_write_unless_invalidated, name, version, build)
+    future.add_done_callback(_cache_write_done)
+
+
+def cache_json_body(request, name, version, cache_key, data):
+    """
+    Render data and cache the JSON body alongside the data.
+    
+    Runs in the background through defer_cache_write(): the client's own
+    response is rendered as usual, so it never waits for this write.
+    """
+    if request.accepted_renderer.format == 'json':
+        renderer = request.accepted_renderer
+        defer_cache_write(name, version, lambda: {json_body_key(cache_key): renderer.render(data)})
+
+
+def cached_response(request, name, cache_key, compute):
+    """
+    Serve cache_key from the cache, computing it on a miss.
+    
+    Tries the pre-rendered JSON body first, then the cached data. On a miss
+    only one worker runs compute() (returning the serialized data) while
+    the others wait for it, so an expired key does not trigger a stampede.
+    """
+    cached = get_cached_json_response(request, cache_key)
+    if cached is not None:
+        logger.info("Cache HIT for %s", cache_key)
+        return cached
+    
+    version = get_cache_version(name)
+    data = get_or_compute(cache_key, compute, name=name, version=version)
+    cache_json_body(request, name, version, cache_key, data)
+    return Response(data)
+
+
+def cached_list(viewset, request, name):
+    """
+    Serve a viewset's list from the versioned list cache.
+    
+    The whole (unpaginated) list is cached. When the view has a paginator,
+    each page is cut from the cached rows per request, so the paginator
+    must accept a list (page number or limit/offset pagination).
+    """
+    cache_key = list_cache_key(name)
+    if viewset.paginator is None:
+        return cached_response(request, name, cache_key, lambda: list_rows(viewset, name))
+    
+    rows = get_or_compute(cache_key, lambda: list_rows(viewset, name))
+    page = viewset.paginate_queryset(rows)
+    if page is None:
+        return Response(rows)
+    return viewset.get_paginated_response(page)
+
+
+def list_rows(viewset, name):
+    """
+    Serialize a viewset's (unpaginated) list straight from ``.values()`` rows.
+    
+    Produces the same data as the viewset's DRF serializer without building
+    model instances or running per-field to_representation. Each row is
+    also cached under its detail key in the background, so retrieving an
+    item that was just listed does not go back to the database; the write
+    is dropped if the model is invalidated meanwhile.
+    """
+    version = get_cache_version(name)
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    rows = list(serialize_rows(queryset, viewset.get_serializer_class()))
+    
+    defer_cache_write(name, version, lambda: {get_cache_key(name, row['id']): row for row in rows})
+    return rows
+
+
+def bulk_rows(viewset, name, ids):
+    """
+    Fetch several detail entries with one cache round trip.
+    
+    Hits come from a single get_many (MGET); all misses are loaded with one
+    ``id__in`` query and cached in the background. Rows are returned in the
+    order of ``ids``; unknown ids are skipped. At most MAX_BULK_IDS distinct
+    ids are accepted per request.
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ids))
+    except ValueError:
+        raise ValidationError({'id': 'Expected integer ids.'})
+    if len(ids) > MAX_BULK_IDS:
+        raise ValidationError({'id': f'At most {MAX_BULK_IDS} ids per request.'})
+    
+    # Ids outside the primary key column's range cannot exist (and overflow
+    # the database driver), so treat them as unknown
+    pk_field = viewset.get_queryset().model._meta.pk
+    min_pk, max_pk = connection.ops.integer_field_range(pk_field.get_internal_type())
+    ids = [pk for pk in ids if min_pk <= pk <= max_pk]
+    
+    version = get_cache_version(name)
+    keys = {pk: get_cache_key(name, pk) for pk in ids}
+    hits = cache.get_many(keys.values())
+    rows = {pk: hits[key] for pk, key in keys.items() if key in hits}
+    
+    missing = [pk for pk in ids if pk not in rows]
+    if missing:
+        queryset = viewset.get_queryset().filter(id__in=missing)
+        fetched = {row['id']: row for row in serialize_rows(queryset, viewset.get_serializer_class())}
+        rows.update(fetched)
+        defer_cache_write(name, version, lambda: {keys[pk]: row for pk, row in fetched.items()})
+    
+    return [rows[pk] for pk in ids if pk in rows]
+
+
 # Create your views here.
 
 
@@ -51,284 +211,93 @@ class UserViewSet(viewsets.ModelViewSet):
     @cache_performance("user_list_cache")
     def list(self, request, *args, **kwargs):
         """Get list of all users with caching"""
-        # Step 1: Create cache key
-        cache_key = get_cache_key('user_list')
-        
-        # Step 2: Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Step 3: Get fresh data from database
-        response = super().list(request, *args, **kwargs)
-        
-        # Step 4: Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
+        return cached_list(self, request, 'user')
 
     @cache_performance("user_detail_cache")
     def retrieve(self, request, *args, **kwargs):
         """Get individual user with caching"""
-        user_id = kwargs.get('pk')
-        cache_key = get_cache_key('user', user_id)
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Get fresh data
-        response = super().retrieve(request, *args, **kwargs)
-        
-        # Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
-
-    def perform_create(self, serializer):
-        """Clear relevant caches when creating a new user"""
-        # Clear list cache
-        cache.delete(get_cache_key('user_list'))
-        logger.info("Cleared user_list cache after create")
-        
-        super().perform_create(serializer)
-
-    def perform_update(self, serializer):
-        """Clear both list and individual caches when updating"""
-        user_id = serializer.instance.id
-        
-        # Clear list cache
-        cache.delete(get_cache_key('user_list'))
-        
-        # Clear individual user cache
-        cache.delete(get_cache_key('user', user_id))
-        
-        logger.info(f"Cleared caches for user {user_id} after update")
-        
-        super().perform_update(serializer)
-
-    def perform_destroy(self, instance):
-        """Clear caches when deleting a user"""
-        user_id = instance.id
-        
-        # Clear list cache
-        cache.delete(get_cache_key('user_list'))
-        
-        # Clear individual user cache
-        cache.delete(get_cache_key('user', user_id))
-        
-        logger.info(f"Cleared caches for user {user_id} after delete")
-        
-        super().perform_destroy(instance)
+        cache_key = get_cache_key('user', kwargs.get('pk'))
+        return cached_response(
+            request, 'user', cache_key, lambda: self.get_serializer(self.get_object()).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """Get several users by id (?id=1&id=2) in one cache round trip"""
+        return Response(bulk_rows(self, 'user', request.query_params.getlist('id')))
 
 
 @api_view(['GET'])
 def cache_stats(request):
     """View to get cache statistics"""
-    try:
-        # Get cache info from Redis
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection('default')
-        
-        # Get all cache keys
-        keys = redis_conn.keys('*')
-        
-        # Get info about cache
-        info = redis_conn.info()
-        
-        return Response({
-            'status': 'success',
-            'total_keys': len(keys),
-            'used_memory': info.get('used_memory_human', 'N/A'),
-            'used_memory_peak': info.get('used_memory_peak_human', 'N/A'),
-            'connected_clients': info.get('connected_clients', 0),
-            'cache_keys': [key.decode('utf-8') if isinstance(key, bytes) else key for key in keys[:20]],  # Limit to first 20
-            'message': f'Total cache keys: {len(keys)}'
-        })
-    except Exception as e:
-        logger.error(f"Error getting cache stats: {str(e)}")
-        return Response({
-            'status': 'error',
-            'message': str(e)
-        }, status=500)
+    stats = get_cache_stats(sample_size=20)
+    if stats['status'] != 'success':
+        return Response(stats, status=500)
+    
+    return Response({
+        'status': 'success',
+        'total_keys': stats['total_keys'],
+        'used_memory': stats['used_memory_human'],
+        'used_memory_peak': stats['used_memory_peak_human'],
+        'connected_clients': stats['connected_clients'],
+        'cache_keys': stats['keys_sample'],
+        'message': f"Total cache keys: {stats['total_keys']}"
+    })
 
 
 class PassengerViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Passengers with caching support.
     
-    Implements caching for list and retrieve operations,
-    with automatic cache invalidation on create, update, and delete.
+    Implements caching for list and retrieve operations; invalidation on
+    create, update, and delete is handled by users.cache_signals.
     """
-    queryset = Passenger.objects.all()
+    queryset = Passenger.objects.select_related('user')
     serializer_class = PassengerSerializer
 
     @cache_performance("passenger_list_cache")
     def list(self, request, *args, **kwargs):
         """Get list of all passengers with caching"""
-        # Step 1: Create cache key
-        cache_key = get_cache_key('passenger_list')
-        
-        # Step 2: Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Step 3: Get fresh data from database
-        response = super().list(request, *args, **kwargs)
-        
-        # Step 4: Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
+        return cached_list(self, request, 'passenger')
 
     @cache_performance("passenger_detail_cache")
     def retrieve(self, request, *args, **kwargs):
         """Get individual passenger with caching"""
-        passenger_id = kwargs.get('pk')
-        cache_key = get_cache_key('passenger', passenger_id)
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Get fresh data
-        response = super().retrieve(request, *args, **kwargs)
-        
-        # Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
-
-    def perform_create(self, serializer):
-        """Clear relevant caches when creating a new passenger"""
-        cache.delete(get_cache_key('passenger_list'))
-        logger.info("Cleared passenger_list cache after create")
-        
-        super().perform_create(serializer)
-
-    def perform_update(self, serializer):
-        """Clear both list and individual caches when updating"""
-        passenger_id = serializer.instance.id
-        
-        cache.delete(get_cache_key('passenger_list'))
-        cache.delete(get_cache_key('passenger', passenger_id))
-        
-        logger.info(f"Cleared caches for passenger {passenger_id} after update")
-        
-        super().perform_update(serializer)
-
-    def perform_destroy(self, instance):
-        """Clear caches when deleting a passenger"""
-        passenger_id = instance.id
-        
-        cache.delete(get_cache_key('passenger_list'))
-        cache.delete(get_cache_key('passenger', passenger_id))
-        
-        logger.info(f"Cleared caches for passenger {passenger_id} after delete")
-        
-        super().perform_destroy(instance)
+        cache_key = get_cache_key('passenger', kwargs.get('pk'))
+        return cached_response(
+            request, 'passenger', cache_key, lambda: self.get_serializer(self.get_object()).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """Get several passengers by id (?id=1&id=2) in one cache round trip"""
+        return Response(bulk_rows(self, 'passenger', request.query_params.getlist('id')))
 
 
 class RiderViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Riders with caching support.
     
-    Implements caching for list and retrieve operations,
-    with automatic cache invalidation on create, update, and delete.
+    Implements caching for list and retrieve operations; invalidation on
+    create, update, and delete is handled by users.cache_signals.
     """
-    queryset = Rider.objects.all()
+    queryset = Rider.objects.select_related('user')
     serializer_class = RiderSerializer
 
     @cache_performance("rider_list_cache")
     def list(self, request, *args, **kwargs):
         """Get list of all riders with caching"""
-        # Step 1: Create cache key
-        cache_key = get_cache_key('rider_list')
-        
-        # Step 2: Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Step 3: Get fresh data from database
-        response = super().list(request, *args, **kwargs)
-        
-        # Step 4: Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
+        return cached_list(self, request, 'rider')
 
     @cache_performance("rider_detail_cache")
     def retrieve(self, request, *args, **kwargs):
         """Get individual rider with caching"""
-        rider_id = kwargs.get('pk')
-        cache_key = get_cache_key('rider', rider_id)
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            logger.info(f"Cache HIT for {cache_key}")
-            return Response(cached_data)
-        
-        logger.info(f"Cache MISS for {cache_key}")
-        
-        # Get fresh data
-        response = super().retrieve(request, *args, **kwargs)
-        
-        # Store in cache
-        cache.set(cache_key, response.data, timeout=settings.CACHE_TTL)
-        
-        return response
-
-    def perform_create(self, serializer):
-        """Clear relevant caches when creating a new rider"""
-        cache.delete(get_cache_key('rider_list'))
-        logger.info("Cleared rider_list cache after create")
-        
-        super().perform_create(serializer)
-
-    def perform_update(self, serializer):
-        """Clear both list and individual caches when updating"""
-        rider_id = serializer.instance.id
-        
-        cache.delete(get_cache_key('rider_list'))
-        cache.delete(get_cache_key('rider', rider_id))
-        
-        logger.info(f"Cleared caches for rider {rider_id} after update")
-        
-        super().perform_update(serializer)
-
-    def perform_destroy(self, instance):
-        """Clear caches when deleting a rider"""
-        rider_id = instance.id
-        
-        cache.delete(get_cache_key('rider_list'))
-        cache.delete(get_cache_key('rider', rider_id))
-        
-        logger.info(f"Cleared caches for rider {rider_id} after delete")
-        
-        super().perform_destroy(instance)
\ No newline at end of file
+        cache_key = get_cache_key('rider', kwargs.get('pk'))
+        return cached_response(
+            request, 'rider', cache_key, lambda: self.get_serializer(self.get_object()).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """Get several riders by id (?id=1&id=2) in one cache round trip"""
+        return Response(bulk_rows(self, 'rider', request.query_params.getlist('id')))